@@ -0,0 +1,130 @@
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tpsread import AsyncTPS, TPS
+
+
+FILENAME = 'testdata/testfile.numeric.tps'
+
+
+@pytest.fixture(scope='module')
+def tps():
+    return TPS(FILENAME, encoding='cp1251', current_tablename='UNNAMED')
+
+
+@pytest.fixture(scope='module')
+def rows(tps):
+    return list(itertools.islice(tps, 3500))
+
+
+def open_async(executor=None):
+    return AsyncTPS.open(FILENAME, executor=executor, encoding='cp1251', current_tablename='UNNAMED')
+
+
+@pytest.mark.parametrize('record_number', [991783, 991784, 1000000, 1045678, 1090422])
+def test_get(tps, record_number):
+    fields = tps.get(record_number)
+    assert fields["b':RecNo'"] == record_number
+
+
+@pytest.mark.parametrize('record_number', [0, 991782, 1090423, 2 ** 32 - 1])
+def test_get_missing(tps, record_number):
+    assert tps.get(record_number) is None
+
+
+def test_get_matches_scan(tps, rows):
+    for row in rows[::97]:
+        assert tps.get(row["b':RecNo'"]) == row
+
+
+def test_scan(rows):
+    async def scan():
+        atps = await open_async()
+        result = []
+        async for row in atps.scan(batch_size=400):
+            result.append(row)
+            if len(result) == len(rows):
+                break
+        assert await atps.get(rows[-1]["b':RecNo'"]) == rows[-1]
+        return result
+
+    assert asyncio.run(scan()) == rows
+
+
+def test_scan_resume_from_row(rows):
+    # checkpoint taken in the middle of a batch
+    async def scan():
+        atps = await open_async()
+        scan = atps.scan(batch_size=1000)
+        async for row in scan:
+            if row == rows[1234]:
+                break
+        await scan.aclose()
+        result = []
+        async for row in atps.scan(batch_size=1000, token=scan.cursor.token):
+            result.append(row)
+            if len(result) == len(rows) - 1235:
+                break
+        return result
+
+    assert asyncio.run(scan()) == rows[1235:]
+
+
+def test_batches_resume(rows):
+    async def scan():
+        atps = await open_async()
+        result = []
+        token = None
+        while len(result) < len(rows):
+            async for batch, token in atps.batches(batch_size=700, token=token):
+                result.extend(batch)
+                # restart from the token of every batch
+                break
+        return result
+
+    assert asyncio.run(scan()) == rows
+
+
+def test_cancelled_scan_is_closed(rows):
+    # the close waits for the batch being read on another worker instead of failing
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    async def scan():
+        atps = await open_async(executor)
+        scan = atps.scan(batch_size=20000)
+        task = asyncio.ensure_future(scan.__anext__())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await scan.aclose()
+        return await atps.get(rows[0]["b':RecNo'"])
+
+    try:
+        assert asyncio.run(scan()) == rows[0]
+    finally:
+        executor.shutdown()
+
+
+@pytest.mark.parametrize('delay', [0, 1])
+def test_timed_out_scan_continues(rows, delay):
+    # a timed out call leaves its batch being read: the next call takes it over
+    async def scan():
+        atps = await open_async()
+        scan = atps.scan(batch_size=500)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scan.__anext__(), 0.0001)
+        await asyncio.sleep(delay)
+        result = []
+        while len(result) < len(rows):
+            try:
+                result.append(await asyncio.wait_for(scan.__anext__(), 0.0001))
+            except asyncio.TimeoutError:
+                pass
+        await scan.aclose()
+        return result
+
+    assert asyncio.run(scan()) == rows
@@ -0,0 +1,130 @@
+import os
+import shutil
+import struct
+import threading
+
+import pytest
+
+from tpsread import TpsCatalog
+
+
+FILENAME = 'testdata/testfile.numeric.tps'
+
+# offset of header change_count
+CHANGE_COUNT_OFFSET = 24
+
+
+@pytest.fixture
+def filename(tmp_path):
+    filename = str(tmp_path / 'numeric.tps')
+    shutil.copy(FILENAME, filename)
+    return filename
+
+
+def open_tps(catalog, filename, **kwargs):
+    return catalog.open(filename, encoding='cp1251', current_tablename='UNNAMED', **kwargs)
+
+
+def test_shared_state(filename):
+    catalog = TpsCatalog()
+    tps = open_tps(catalog, filename)
+    other = open_tps(catalog, os.path.relpath(filename))
+    assert len(catalog) == 1
+    assert other is not tps
+    assert other.pages is tps.pages and other.tables is tps.tables
+    assert other.cache_pages is not tps.cache_pages
+    assert other.get(991790) == tps.get(991790)
+
+
+def test_options_in_key(filename):
+    catalog = TpsCatalog()
+    tps = open_tps(catalog, filename)
+    checked = open_tps(catalog, filename, check=True)
+    assert len(catalog) == 2
+    assert checked.pages is not tps.pages
+    assert checked.check and checked.pages.check and checked.tables.check
+    assert not tps.pages.check
+    assert open_tps(catalog, filename, check=True).pages is checked.pages
+
+
+def test_changed_file(filename):
+    catalog = TpsCatalog()
+    tps = open_tps(catalog, filename)
+    stat = os.stat(filename)
+    with open(filename, 'r+b') as f:
+        f.seek(CHANGE_COUNT_OFFSET)
+        f.write(struct.pack('<I', tps.header.change_count + 1))
+    # changed in place within mtime resolution
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    other = open_tps(catalog, filename)
+    assert other.pages is not tps.pages
+    assert other.header.change_count == tps.header.change_count + 1
+    assert len(catalog) == 1
+
+
+def test_modified_file(filename):
+    catalog = TpsCatalog()
+    tps = open_tps(catalog, filename)
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert open_tps(catalog, filename).pages is not tps.pages
+
+
+def test_evicted_file_stays_open(tmp_path):
+    catalog = TpsCatalog(max_open=1)
+    filenames = []
+    for name in ('a.tps', 'b.tps'):
+        filenames.append(str(tmp_path / name))
+        shutil.copy(FILENAME, filenames[-1])
+    tps = open_tps(catalog, filenames[0])
+    open_tps(catalog, filenames[1])
+    assert len(catalog) == 1
+    assert tps.get(991790)["b':RecNo'"] == 991790
+    assert open_tps(catalog, filenames[0]).pages is not tps.pages
+
+
+def test_scan_dir(tmp_path):
+    for name in ('a.tps', 'b.TPS', 'c.txt'):
+        shutil.copy(FILENAME, str(tmp_path / name))
+    catalog = TpsCatalog()
+    opened = catalog.scan_dir(str(tmp_path), workers=2, encoding='cp1251', current_tablename='UNNAMED')
+    assert sorted(opened) == ['a.tps', 'b.TPS']
+    assert len(catalog) == 2
+    assert opened['b.TPS'].get(991790) == opened['a.tps'].get(991790)
+
+
+def test_buffer_not_cached():
+    with open(FILENAME, 'rb') as f:
+        data = f.read()
+    catalog = TpsCatalog()
+    tps = open_tps(catalog, data)
+    assert len(catalog) == 0
+    assert tps.get(991790)["b':RecNo'"] == 991790
+
+
+def test_concurrent_readers(filename):
+    # instances of a file share its file position: every read has its own position
+    catalog = TpsCatalog()
+    tps = open_tps(catalog, filename)
+    other = open_tps(catalog, filename, cached=False)
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        try:
+            while not stop.is_set():
+                for record_number in (991790, 1045678, 1090422):
+                    assert other.get(record_number)["b':RecNo'"] == record_number
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    try:
+        report = tps.validate(processes=1)
+    finally:
+        stop.set()
+        thread.join()
+    assert report.ok, report.as_dict()
+    assert not errors
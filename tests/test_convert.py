@@ -0,0 +1,149 @@
+import sqlite3
+import struct
+
+import pytest
+
+from tpsread import TPS
+from tpsread.tpsconvert import convert, convert_file, TpsConvertTable
+
+
+FILENAME = 'testdata/testfile.numeric.tps'
+
+# field type, offset, name, size, field number; listed out of field number order
+FIELDS = [(0x06, 2, b'VALUE', 4, 1),
+          (0x02, 0, b'ID', 2, 0),
+          (0x12, 6, b'NAME', 4, 2)]
+
+# index flags
+NOCASE = 0x04
+DUP = 0x01
+
+# index name, index type (KEY=0, INDEX=1), flags, [(field number, descending)]
+INDEXES = [(b'KEYID', 0, 0, [(0, False)]),
+           (b'BYVALUE', 1, DUP, [(1, True)]),
+           (b'BYNAME', 0, NOCASE | DUP, [(2, False), (0, False)])]
+
+
+def table_definition(prefix):
+    definition = struct.pack('<HHHHH', 1, 10, len(FIELDS), 0, len(INDEXES))
+    for field_type, offset, name, size, number in FIELDS:
+        definition += struct.pack('<BH', field_type, offset) + prefix + b':' + name + b'\x00'
+        definition += struct.pack('<HHHH', 1, size, 0, number)
+        if field_type == 0x12:
+            # STRING array element size, template
+            definition += struct.pack('<HH', size, 0)
+    for name, index_type, flags, index_fields in INDEXES:
+        definition += b'\x00\x01' + prefix + b':' + name + b'\x00' + struct.pack('<BH', index_type << 5 | flags,
+                                                                                  len(index_fields))
+        for number, descending in index_fields:
+            definition += struct.pack('<HH', number, descending)
+    # portion number
+    return struct.pack('<H', 0) + definition
+
+
+def record(data):
+    # not compressed against the previous record: record size and header size follow
+    return struct.pack('<BHH', 0xC0, len(data), 0) + data
+
+
+def build_tps(tables):
+    """
+    Single data page TPS file of tables: [(table number, name or None, [(record number, id, value, name)])]
+    """
+    records = b''
+    for table_number, name, rows in tables:
+        for record_number, id_value, value, name_value in rows:
+            records += record(struct.pack('>IBI', table_number, 0xF3, record_number) +
+                              struct.pack('<hi4s', id_value, value, name_value))
+        records += record(struct.pack('>IB', table_number, 0xFA) + table_definition(b'T%d' % table_number))
+    for table_number, name, rows in tables:
+        if name is not None:
+            records += record(b'\xfe' + name + struct.pack('>I', table_number))
+
+    page_size = 13 + len(records)
+    page_refs = (page_size + 0xFF) // 0x100
+    file_size = 0x200 + page_refs * 0x100
+    page = struct.pack('<IHHHHB', 0x200, page_size, page_size, page_size, len(records), 0) + records
+    header = struct.pack('<IHII', 0, 0x200, file_size, file_size) + b'tOpS\x00\x00'
+    header += struct.pack('>I', 100) + struct.pack('<II', 1, 0)
+    header += struct.pack('<60I', *([0] * 60)) + struct.pack('<60I', *([page_refs] + [0] * 59))
+    return header + page.ljust(file_size - 0x200, b'\x00')
+
+
+@pytest.fixture
+def keyed_file(tmp_path):
+    filename = tmp_path / 'keyed.tps'
+    filename.write_bytes(build_tps([(1, None, [(1, 5, 50, b'abc '), (2, 6, 60, b'ABC ')]),
+                                    (2, b'UNNAMED', [(1, 7, 70, b'x   ')])]))
+    return str(filename)
+
+
+def test_index_fields_by_number(keyed_file):
+    tps = TPS(keyed_file, encoding='cp1251')
+    table = TpsConvertTable(tps, 1)
+    assert [column.name for column in table.columns] == ['RecNo', 'VALUE', 'ID', 'NAME']
+    assert table.indexes == [('keyed_KEYID', True, [('ID', False, False)]),
+                             ('keyed_BYVALUE', False, [('VALUE', True, False)]),
+                             ('keyed_BYNAME', False, [('NAME', False, True), ('ID', False, False)])]
+
+
+def test_unique_table_names(keyed_file, tmp_path):
+    output = convert_file(keyed_file, str(tmp_path / 'keyed.sqlite'), encoding='cp1251')
+    connection = sqlite3.connect(output)
+    try:
+        assert connection.execute('SELECT RecNo, ID, VALUE, NAME FROM keyed ORDER BY RecNo').fetchall() == \
+            [(1, 5, 50, 'abc'), (2, 6, 60, 'ABC')]
+        assert connection.execute('SELECT RecNo, ID, VALUE FROM keyed_2').fetchall() == [(1, 7, 70)]
+        with pytest.raises(sqlite3.IntegrityError):
+            connection.execute("INSERT INTO keyed VALUES (3, 0, 5, 'x')")
+        # duplicates allowed
+        connection.execute("INSERT INTO keyed VALUES (3, 70, 7, 'Abc')")
+        assert connection.execute("SELECT count(*) FROM keyed WHERE NAME = 'aBC'").fetchone() == (0,)
+        assert connection.execute("SELECT count(*) FROM keyed INDEXED BY keyed_BYNAME "
+                                  "WHERE NAME = 'aBC' COLLATE NOCASE").fetchone() == (3,)
+        indexes = connection.execute("SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' "
+                                     "ORDER BY name").fetchall()
+    finally:
+        connection.close()
+    assert [(name, table) for name, table, sql in indexes] == [('keyed_2_BYNAME', 'keyed_2'),
+                                                              ('keyed_2_BYVALUE', 'keyed_2'),
+                                                              ('keyed_2_KEYID', 'keyed_2'),
+                                                              ('keyed_BYNAME', 'keyed'),
+                                                              ('keyed_BYVALUE', 'keyed'),
+                                                              ('keyed_KEYID', 'keyed')]
+    assert indexes[0][2] == 'CREATE INDEX "keyed_2_BYNAME" ON "keyed_2" ("NAME" COLLATE NOCASE, "ID")'
+    assert indexes[1][2] == 'CREATE INDEX "keyed_2_BYVALUE" ON "keyed_2" ("VALUE" DESC)'
+    assert indexes[2][2] == 'CREATE UNIQUE INDEX "keyed_2_KEYID" ON "keyed_2" ("ID")'
+
+
+def test_column_types(tmp_path):
+    tps = TPS(FILENAME, encoding='cp1251', cached=False, current_tablename='UNNAMED')
+    table = TpsConvertTable(tps, tps.tables.list()[0])
+    definition = tps.tables.get_definition(table.number)
+    assert [column.type for column in table.columns[1:]] == \
+        [field.type for field in definition.record_table_definition_field]
+
+    assert table.name == 'testfile.numeric'
+
+    output = convert(tps, str(tmp_path / 'numeric.sqlite'))
+    connection = sqlite3.connect(output)
+    try:
+        assert connection.execute('SELECT count(*), min(RecNo), max(RecNo) FROM "testfile.numeric"').fetchone() == \
+            (98640, 991783, 1090422)
+        row = connection.execute('SELECT * FROM "testfile.numeric" WHERE RecNo = 991790').fetchone()
+    finally:
+        connection.close()
+    assert row == table.row(tps.get(991790))
+
+
+def test_time_column():
+    tps = TPS('testdata/simple.nodata.tps', encoding='cp1251')
+    table = TpsConvertTable(tps, tps.tables.list()[0])
+    assert 'TIME' in [column.type for column in table.columns]
+
+
+def test_parquet(keyed_file, tmp_path):
+    pyarrow = pytest.importorskip('pyarrow.parquet')
+    output = convert_file(keyed_file, str(tmp_path / 'keyed'), 'parquet', encoding='cp1251')
+    assert pyarrow.read_table(output + '/keyed_2.parquet').to_pydict() == {'RecNo': [1], 'VALUE': [70], 'ID': [7],
+                                                                        'NAME': ['x']}
@@ -0,0 +1,73 @@
+import itertools
+
+import pytest
+
+from tpsread import TPS, TpsCursor
+
+
+FILENAME = 'testdata/testfile.numeric.tps'
+
+
+@pytest.fixture(scope='module')
+def tps():
+    return TPS(FILENAME, encoding='cp1251', cached=False, current_tablename='UNNAMED')
+
+
+def take(rows, count):
+    return list(itertools.islice(rows, count))
+
+
+def test_token_round_trip():
+    cursor = TpsCursor(938, 991782, 0x10ab, 13)
+    assert TpsCursor.from_token(cursor.token).__dict__ == cursor.__dict__
+
+
+@pytest.mark.parametrize('token', ['', 'x.1.2.3', '1.2.3', None, 42])
+def test_bad_token(token):
+    with pytest.raises(ValueError):
+        TpsCursor.from_token(token)
+
+
+def test_resume(tps):
+    scan = tps.iter_from()
+    take(scan, 1000)
+    token = scan.cursor.token
+    expected = take(scan, 100)
+    scan.close()
+
+    resumed = tps.iter_from(token)
+    assert take(resumed, 100) == expected
+    resumed.close()
+
+
+def test_resume_changed_file(tps):
+    scan = tps.iter_from()
+    take(scan, 1)
+    cursor = scan.cursor
+    scan.close()
+    cursor.change_count += 1
+    with pytest.raises(ValueError):
+        tps.iter_from(cursor.token)
+
+
+def test_resume_not_data_page(tps):
+    with pytest.raises(ValueError):
+        tps.iter_from(TpsCursor(tps.header.change_count, tps.current_table_number, tps.header.page_root_ref, 0).token)
+
+
+def test_scans_own_cursors(tps):
+    a = iter(tps)
+    b = tps.iter_from()
+    take(a, 100)
+    token = a.cursor.token
+    take(b, 5)
+    assert b.cursor.token != token
+    assert a.cursor.token == token
+    assert tps.cursor is b.cursor
+
+    expected = take(a, 10)
+    a.close()
+    b.close()
+    resumed = tps.iter_from(token)
+    assert take(resumed, 10) == expected
+    resumed.close()
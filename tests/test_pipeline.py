@@ -0,0 +1,61 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from tpsread import TPS
+from tpsread.utils import prefetch
+
+
+FILENAME = 'testdata/testfile.numeric.tps'
+
+
+def wait_threads(threads, timeout=5):
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+    return [thread for thread in threads if thread.is_alive()]
+
+
+@pytest.mark.parametrize('depth', [0, 1, 4])
+def test_prefetch(depth):
+    assert list(prefetch(range(100), depth)) == list(range(100))
+
+
+def test_prefetch_error():
+    def items():
+        yield 1
+        raise KeyError('page')
+
+    rows = prefetch(items(), 2)
+    assert next(rows) == 1
+    with pytest.raises(KeyError):
+        next(rows)
+
+
+def test_prefetch_close():
+    produced = []
+    before = set(threading.enumerate())
+    rows = prefetch((produced.append(i) or i for i in itertools.count()), 2)
+    assert next(rows) == 0
+    threads = [thread for thread in threading.enumerate() if thread not in before]
+    rows.close()
+    assert not wait_threads(threads)
+    # up to depth items queued ahead, one waiting to be put
+    assert len(produced) <= 4
+
+
+def test_prefetch_scan():
+    tps = TPS(FILENAME, encoding='cp1251', current_tablename='UNNAMED', cached=False)
+    expected = list(itertools.islice(tps, 5000))
+
+    tps = TPS(FILENAME, encoding='cp1251', current_tablename='UNNAMED', cached=False, prefetch=2)
+    before = set(threading.enumerate())
+    scan = tps.iter_from()
+    assert list(itertools.islice(scan, 5000)) == expected
+    threads = [thread for thread in threading.enumerate() if thread not in before]
+    assert threads
+    scan.close()
+    assert not wait_threads(threads)
+    assert not tps.cache_pages
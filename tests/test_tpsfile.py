@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import pytest
+
+from tpsread import TPS
+from tpsread.tpsfile import PAGE_GRANULARITY, TpsFileReader
+
+
+FILENAME = 'testdata/testfile.numeric.tps'
+
+
+@pytest.fixture(scope='module')
+def tps():
+    return TPS(FILENAME, encoding='cp1251', current_tablename='UNNAMED')
+
+
+def read_data():
+    with open(FILENAME, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('source', [
+    lambda: FILENAME.encode(),
+    lambda: read_data(),
+    lambda: memoryview(read_data()),
+    lambda: io.BytesIO(read_data()),
+])
+def test_sources(tps, source):
+    other = TPS(source(), encoding='cp1251', current_tablename='UNNAMED')
+    assert other.header.change_count == tps.header.change_count
+    assert other.pages.leaf_count() == tps.pages.leaf_count()
+    assert other.get(991790) == tps.get(991790)
+
+
+def test_bytes_path_not_found():
+    with pytest.raises(FileNotFoundError):
+        TPS(b'testdata/missing.tps')
+
+
+def test_zip_read_ahead(tps):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.write(FILENAME, 'file.tps')
+    with zipfile.ZipFile(buffer).open('file.tps') as stream:
+        other = TPS(stream, encoding='cp1251', current_tablename='UNNAMED', read_ahead=tps.file_size)
+        assert other.name == 'file'
+        assert other.get(991790) == tps.get(991790)
+
+
+def test_read_ahead_alignment():
+    data = bytes(range(256)) * 64
+    reader = TpsFileReader(io.BytesIO(data), read_ahead=1000)
+    assert reader.read_ahead % PAGE_GRANULARITY == 0
+    reader.seek(0x1F0)
+    assert reader.read(0x20) == data[0x1F0:0x210]
+    reader.seek(0x80)
+    assert reader.read(4) == data[0x80:0x84]
+    assert reader.tell() == 0x84
+    assert reader.size() == len(data)
@@ -0,0 +1,101 @@
+import io
+import struct
+import warnings
+
+import pytest
+
+from tpsread import TPS
+from tpsread.tpsvalidate import validate_file
+
+
+FILENAME = 'testdata/testfile.numeric.tps'
+
+
+@pytest.fixture(scope='module')
+def data():
+    with open(FILENAME, 'rb') as f:
+        return f.read()
+
+
+def test_valid_file():
+    report = TPS(FILENAME, encoding='cp1251').validate(processes=1)
+    assert report.ok
+    assert report.page_count == 3170
+    assert report.record_count == 98645
+
+
+def test_valid_file_parallel():
+    report = validate_file(FILENAME, encoding='cp1251', processes=2)
+    assert report.ok, report.as_dict()
+    assert report.record_count == 98645
+
+
+def test_bad_header_mark(data):
+    mark = data.index(b'tOpS')
+    report = validate_file(data[:mark] + b'xOpS' + data[mark + 4:], processes=1)
+    assert not report.ok
+    assert report.errors == ['Bad header mark: not a TPS file or bad password']
+
+
+def test_short_header(data):
+    report = validate_file(data[:100], processes=1)
+    assert len(report.errors) == 1
+    assert report.errors[0].startswith('Header can not be parsed')
+
+
+def test_truncated_file(data):
+    report = validate_file(data[:len(data) // 2], encoding='cp1251', processes=1)
+    assert not report.ok
+    assert any(error.startswith('Header file size') for error in report.errors)
+    assert any(message.endswith('is beyond the end of file')
+               for messages in report.page_errors.values() for message in messages)
+    assert 0 < report.record_count < 98645
+
+
+def test_corrupted_page(data):
+    tps = TPS(FILENAME, encoding='cp1251', cached=False)
+    page = tps.pages.leaf(100)
+    corrupted = bytearray(data)
+    # first record length flag
+    corrupted[page.offset + 13] ^= 0x80
+    report = validate_file(bytes(corrupted), encoding='cp1251', processes=1)
+    assert list(report.page_errors) == [page.ref]
+    assert report.page_errors[page.ref][0].startswith('Records can not be read')
+
+
+def test_missing_file():
+    report = validate_file('testdata/missing.tps')
+    assert report.errors[0].startswith('File can not be opened')
+
+
+def test_page_spans_several_pages(data):
+    tps = TPS(FILENAME, encoding='cp1251', cached=False)
+    pages = sorted((tps.pages[ref] for ref in tps.pages.list()), key=lambda page: page.offset)[100:104]
+    corrupted = bytearray(data)
+    # page size, up to the middle of the fourth page
+    corrupted[pages[0].offset + 4:pages[0].offset + 6] = struct.pack('<H', pages[3].offset - pages[0].offset + 1)
+    report = validate_file(bytes(corrupted), encoding='cp1251', processes=1)
+    for page in pages[1:]:
+        assert 'Page intersects with the page ref# {0}'.format(pages[0].ref) in report.page_errors[page.ref]
+
+
+def test_uncompressed_size(data):
+    tps = TPS(FILENAME, encoding='cp1251', cached=False)
+    page = next(page for page in tps.pages.leaves() if page.uncompressed_size > page.size)
+    corrupted = bytearray(data)
+    corrupted[page.offset + 6:page.offset + 8] = struct.pack('<H', page.uncompressed_size + 1)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        report = validate_file(bytes(corrupted), encoding='cp1251', processes=1)
+    assert not caught
+    assert report.page_errors == {page.ref: ['Uncompressed size {0} does not coincide with page uncompressed size {1}'
+                                             .format(page.uncompressed_size, page.uncompressed_size + 1)]}
+
+
+def test_file_object_not_reopened(data):
+    # the name of a file-like object is not a path to reopen in worker processes
+    source = io.BytesIO(data)
+    source.name = 'testdata/simple.nodata.tps'
+    report = validate_file(source, encoding='cp1251', processes=2)
+    assert report.ok, report.as_dict()
+    assert report.record_count == 98645
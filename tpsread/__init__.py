@@ -17,7 +17,11 @@ __license__ = 'GPL'
 __version__ = '0.0.7'
 
 from .tps import TPS
+from .tpsasync import AsyncTPS, AsyncTpsScan
+from .tpscatalog import CATALOG, TpsCatalog
 from .tpscrypt import TpsDecryptor
+from .tpscursor import TpsCursor, TpsScan
+from .tpsvalidate import TpsValidationReport
 
 # list of public objects
 __all__ = []
@@ -0,0 +1,71 @@
+"""
+Command line interface
+
+python -m tpsread validate FILE [FILE ...]
+python -m tpsread convert SOURCE OUTPUT
+"""
+
+import argparse
+import json
+import os.path
+import sys
+
+from .tpsconvert import BATCH_SIZE, convert_dir, convert_file, WRITERS
+from .tpsvalidate import validate_file
+
+
+def validate_command(args):
+    ok = True
+    for filename in args.files:
+        report = validate_file(filename, encoding=args.encoding, password=args.password, processes=args.processes)
+        ok = ok and report.ok
+        print(json.dumps(report.as_dict(), indent=2))
+    return 0 if ok else 1
+
+
+def convert_command(args):
+    kwargs = {'encoding': args.encoding, 'password': args.password,
+              'date_fieldname': [name.lower() for name in args.date_field],
+              'time_fieldname': [name.lower() for name in args.time_field]}
+    if os.path.isdir(args.source):
+        outputs = convert_dir(args.source, args.output, args.format, args.batch_size, args.processes, **kwargs)
+    else:
+        outputs = [convert_file(args.source, args.output, args.format, args.batch_size, **kwargs)]
+    for output in outputs:
+        print(output)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tpsread', description='Read Clarion (TopSpeed) .TPS files')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    validate_parser = subparsers.add_parser('validate', help='check file integrity, print JSON report')
+    validate_parser.add_argument('files', nargs='+', metavar='FILE')
+    validate_parser.add_argument('--encoding', default='cp1251')
+    validate_parser.add_argument('--password')
+    validate_parser.add_argument('--processes', type=int, help='worker processes (default: CPU count)')
+    validate_parser.set_defaults(func=validate_command)
+
+    convert_parser = subparsers.add_parser('convert', help='convert file or directory of files to SQLite/Parquet')
+    convert_parser.add_argument('source', metavar='SOURCE', help='TPS file or directory')
+    convert_parser.add_argument('output', metavar='OUTPUT',
+                                help='SQLite database / Parquet directory, or output directory for SOURCE directory')
+    convert_parser.add_argument('--format', choices=sorted(WRITERS), default='sqlite')
+    convert_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='rows per batched write')
+    convert_parser.add_argument('--processes', type=int, help='worker processes for a directory (default: CPU count)')
+    convert_parser.add_argument('--encoding', default='cp1251')
+    convert_parser.add_argument('--password')
+    convert_parser.add_argument('--date-field', action='append', default=[], metavar='NAME',
+                                help='LONG field holding a Clarion date (repeatable)')
+    convert_parser.add_argument('--time-field', action='append', default=[], metavar='NAME',
+                                help='LONG field holding a Clarion time (repeatable)')
+    convert_parser.set_defaults(func=convert_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
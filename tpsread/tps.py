@@ -7,31 +7,52 @@ http://www.softvelocity.com/clarion/pdf/databasedrivers.pdf
 """
 
 import os.path
-import mmap
-from datetime import date
+from datetime import date, time as datetime_time
 import time
 from warnings import warn
 from binascii import hexlify
+import threading
 
 from six import text_type
-from construct import adapters, Array, Byte, Bytes, Const, LFloat32, LFloat64, Struct, SLInt16, SLInt32, UBInt32, \
-    ULInt8, ULInt16, ULInt32
+from construct import adapters, Array, Byte, Bytes, Const, Container, LFloat32, LFloat64, Struct, SLInt16, SLInt32, \
+    UBInt32, ULInt8, ULInt16, ULInt32
 
 from .tpscrypt import TpsDecryptor
+from .tpscursor import TpsCursor, TpsScan
+from .tpsfile import open_source, READ_AHEAD_SIZE
 from .tpstable import TpsTablesList
 from .tpspage import TpsPagesList
-from .tpsrecord import TpsRecordsList
-from .utils import check_value
+from .tpsrecord import page_records
+from .utils import check_value, prefetch
 
 
 
 
+# TPS file header
+HEADER_STRUCT = Struct('header',
+                       ULInt32('offset'),
+                       ULInt16('size'),
+                       ULInt32('file_size'),
+                       ULInt32('allocated_file_size'),
+                       Const(Bytes('top_speed_mark', 6), b'tOpS\x00\x00'),
+                       UBInt32('last_issued_row'),
+                       ULInt32('change_count'),
+                       ULInt32('page_root_ref'),
+                       Array(lambda ctx: (ctx['size'] - 0x20) / 2 / 4, ULInt32('block_start_ref')),
+                       Array(lambda ctx: (ctx['size'] - 0x20) / 2 / 4, ULInt32('block_end_ref')), )
+
 # Date structure
 DATE_STRUCT = Struct('date_struct',
                      Byte('day'),
                      Byte('month'),
                      ULInt16('year'), )
 
+# Key of a data record: first bytes of record data
+DATA_KEY_STRUCT = Struct('data_key',
+                         UBInt32('table_number'),
+                         Byte('type'),
+                         UBInt32('record_number'))
+
 # Time structure
 TIME_STRUCT = Struct('time_struct',
                      Byte('centisecond'),
@@ -47,16 +68,29 @@ class TPS:
 
     def __init__(self, filename, encoding=None, password=None, cached=True, check=False,
                  current_tablename=None, date_fieldname=None,
-                 time_fieldname=None, decryptor_class=TpsDecryptor):
-        self.filename = filename
+                 time_fieldname=None, decryptor_class=TpsDecryptor, read_ahead=READ_AHEAD_SIZE, prefetch=0,
+                 shared=None, parse=True):
+        """
+        filename may be a path (str or bytes), a bytes-like object, an mmap or a seekable file-like object
+        (read through a read_ahead bytes buffer; for compressed streams see tpsfile.TpsFileReader).
+
+        Scans read, decrypt and decompress up to prefetch data pages ahead on a background thread.
+        With cached=False scan memory does not grow with file size.
+
+        shared is an opened TPS of the same file (and encoding, password): its file, header, page tree,
+        tables and decryptor are reused instead of being read again, see TpsCatalog.
+
+        With parse=False only the file is opened: header, page tree and tables are left to the caller,
+        see tpsvalidate.validate_file.
+        """
         self.encoding = encoding
         self.password = password
         self.cached = cached
         self.check = check
+        self.prefetch = prefetch
         self.current_table_number = None
-        # Name part before .tps
-        self.name = os.path.basename(filename)
-        self.name = text_type(os.path.splitext(self.name)[0]).lower()
+        # position of the last record yielded by a scan, see iter_from
+        self.cursor = None
         if date_fieldname is not None:
             self.date_fieldname = date_fieldname
         else:
@@ -67,10 +101,18 @@ class TPS:
             self.time_fieldname = []
         self.cache_pages = {}
 
-        if not os.path.isfile(self.filename):
-            raise FileNotFoundError(self.filename)
-
-        self.file_size = os.path.getsize(self.filename)
+        # path: local file path, None for buffers and file-like objects
+        if shared is None:
+            self.tps_file, self.file_size, self.filename, self.path = open_source(filename, read_ahead)
+            # seek + read of tps_file from scan threads
+            self.lock = threading.RLock()
+        else:
+            self.tps_file, self.file_size, self.filename, self.path = \
+                shared.tps_file, shared.file_size, shared.filename, shared.path
+            self.lock = shared.lock
+        # Name part before .tps
+        self.name = os.path.basename(self.filename)
+        self.name = text_type(os.path.splitext(self.name)[0]).lower()
 
         # Check file size
         if check:
@@ -78,31 +120,23 @@ class TPS:
                 # TODO check translate
                 warn('File size is not a multiple of 64 bytes.', RuntimeWarning)
 
-        with open(self.filename, mode='r+b') as tpsfile:
-            self.tps_file = mmap.mmap(tpsfile.fileno(), 0)
-
+        if shared is not None:
+            self.decryptor = shared.decryptor
+            self.header = shared.header
+            self.pages = shared.pages
+            self.tables = shared.tables
+            self.set_current_table(current_tablename)
+        else:
             self.decryptor = decryptor_class(self.tps_file, self.password)
 
-            try:
-                # TPS file header
-                header = Struct('header',
-                                ULInt32('offset'),
-                                ULInt16('size'),
-                                ULInt32('file_size'),
-                                ULInt32('allocated_file_size'),
-                                Const(Bytes('top_speed_mark', 6), b'tOpS\x00\x00'),
-                                UBInt32('last_issued_row'),
-                                ULInt32('change_count'),
-                                ULInt32('page_root_ref'),
-                                Array(lambda ctx: (ctx['size'] - 0x20) / 2 / 4, ULInt32('block_start_ref')),
-                                Array(lambda ctx: (ctx['size'] - 0x20) / 2 / 4, ULInt32('block_end_ref')), )
-
-                self.header = header.parse(self.read(0x200))
-                self.pages = TpsPagesList(self, self.header.page_root_ref, check=self.check)
-                self.tables = TpsTablesList(self, encoding=self.encoding, check=self.check)
-                self.set_current_table(current_tablename)
-            except adapters.ConstError:
-                print('Bad cryptographic keys.')
+            if parse:
+                try:
+                    self.header = HEADER_STRUCT.parse(self.read(0x200, 0))
+                    self.pages = TpsPagesList(self, self.header.page_root_ref, check=self.check)
+                    self.tables = TpsTablesList(self, encoding=self.encoding, check=self.check)
+                    self.set_current_table(current_tablename)
+                except adapters.ConstError:
+                    print('Bad cryptographic keys.')
 
     def block_contains(self, start_ref, end_ref):
         for i in range(len(self.header.block_start_ref)):
@@ -111,83 +145,179 @@ class TPS:
         return False
 
     def read(self, size, pos=None):
-        if pos is not None:
-            self.seek(pos)
-        else:
-            pos = self.tps_file.tell()
-        if self.decryptor.is_encrypted():
-            return self.decryptor.decrypt(size, pos)
-        else:
-            return self.tps_file.read(size)
+        with self.lock:
+            if pos is not None:
+                self.seek(pos)
+            else:
+                pos = self.tps_file.tell()
+            if self.decryptor.is_encrypted():
+                return self.decryptor.decrypt(size, pos)
+            else:
+                return self.tps_file.read(size)
 
     def seek(self, pos):
         self.tps_file.seek(pos)
 
     def __iter__(self):
+        return self.iter_from()
+
+    def iter_from(self, token=None):
+        """
+        Scan records of the current table, starting from a checkpoint token of a previous scan.
+
+        Return TpsScan: an iterator whose cursor points to the record following the last one yielded.
+        self.cursor is the cursor of the last record yielded by any scan of this file.
+        """
+        if token is None:
+            start_page_ref = None
+            start_record_index = 0
+        else:
+            cursor = TpsCursor.from_token(token)
+            if cursor.change_count != self.header.change_count:
+                raise ValueError('File was changed after checkpoint (change_count {0} != {1})'
+                                 .format(cursor.change_count, self.header.change_count))
+            if cursor.table_number != self.current_table_number:
+                raise ValueError('Checkpoint belongs to another table (number {0})'.format(cursor.table_number))
+            start_page_ref = cursor.page_ref
+            start_record_index = cursor.record_index
+
+        scan = TpsScan()
+        scan.rows = self.__scan(scan, self.pages.leaves(start_page_ref), start_page_ref, start_record_index)
+        return scan
+
+    def __scan(self, scan, pages, start_page_ref, start_record_index):
+        table_definition = self.tables.get_definition(self.current_table_number)
+        for page, record_index, record in self.__records(pages):
+            if page.ref == start_page_ref and record_index < start_record_index:
+                continue
+            if record.type == 'DATA' and record.data.table_number == self.current_table_number:
+                if self.check:
+                    check_value('table_record_size', len(record.data.data), table_definition.record_size)
+                fields = self.__fields(record, table_definition)
+                scan.cursor = TpsCursor(self.header.change_count, self.current_table_number,
+                                        page.ref, record_index + 1)
+                self.cursor = scan.cursor
+                yield fields
+
+    def iter_tables(self):
+        """
+        Iterate records of all tables in a single pass over the file, yield (table number, fields).
+        """
+        table_definitions = {}
+        for table_number in self.tables.list():
+            table_definitions[table_number] = self.tables.get_definition(table_number)
+
+        for page, record_index, record in self.__records(self.pages.leaves()):
+            if record.type == 'DATA' and record.data.table_number in table_definitions:
+                table_definition = table_definitions[record.data.table_number]
+                if self.check:
+                    check_value('table_record_size', len(record.data.data), table_definition.record_size)
+                yield record.data.table_number, self.__fields(record, table_definition)
+
+    def __records(self, pages):
+        # streaming pipeline: data pages -> page data (read, decrypt, decompress; prefetched) -> records
+        for page, records in prefetch(self.__pages_records(pages), self.prefetch):
+            for record_index, record in enumerate(records):
+                yield page, record_index, record
+
+    def __pages_records(self, pages):
+        for page in pages:
+            yield page, page_records(self, page, check=self.check)
+
+    def get(self, record_number):
+        """
+        Fields of the current table record with record_number, or None.
+
+        Records are ordered in data pages by their bytes (table number, record type, record number),
+        so the data page is found by binary search over the first records of data pages.
+        """
+        key = DATA_KEY_STRUCT.build(Container(table_number=self.current_table_number, type=0xF3,
+                                              record_number=record_number))
+        low = 0
+        high = self.pages.leaf_count()
+        # last data page with first record key <= key
+        while high - low > 1:
+            middle = (low + high) // 2
+            first_record = next(iter(page_records(self, self.pages.leaf(middle))), None)
+            if first_record is not None and first_record.data_bytes[2:2 + len(key)] <= key:
+                low = middle
+            else:
+                high = middle
+        if high == 0:
+            return None
+
         table_definition = self.tables.get_definition(self.current_table_number)
-        for page_ref in self.pages.list():
-            if self.pages[page_ref].hierarchy_level == 0:
-                for record in TpsRecordsList(self, self.pages[page_ref], encoding=self.encoding, check=self.check):
-                    if record.type == 'DATA' and record.data.table_number == self.current_table_number:
-                        check_value('table_record_size', len(record.data.data), table_definition.record_size)
-                        # TODO convert name to string
-                        fields = {"b':RecNo'": record.data.record_number}
-                        for field in table_definition.record_table_definition_field:
-                            field_data = record.data.data[field.offset:field.offset + field.size]
-                            value = ''
-                            if field.type == 'BYTE':
-                                value = ULInt8('byte').parse(field_data)
-                            elif field.type == 'SHORT':
-                                value = SLInt16('short').parse(field_data)
-                            elif field.type == 'USHORT':
-                                value = ULInt16('ushort').parse(field_data)
-                            elif field.type == 'DATE':
-                                value = self.to_date(field_data)
-                            elif field.type == 'TIME':
-                                value = self.to_time(field_data)
-                            elif field.type == 'LONG':
-                                #TODO
-                                if field.name.decode(encoding='cp437').split(':')[1].lower() in self.date_fieldname:
-                                    if SLInt32('long').parse(field_data) == 0:
-                                        value = None
-                                    else:
-                                        value = date.fromordinal(657433 + SLInt32('long').parse(field_data))
-                                elif field.name.decode(encoding='cp437').split(':')[1].lower() in self.time_fieldname:
-                                    s, ms = divmod(SLInt32('long').parse(field_data), 100)
-                                    value = str('{}.{:03d}'.format(time.strftime('%Y-%m-%d %H:%M:%S',
-                                                                                 time.gmtime(s)), ms))
-                                else:
-                                    value = SLInt32('long').parse(field_data)
-                            elif field.type == 'ULONG':
-                                value = ULInt32('ulong').parse(field_data)
-                            elif field.type == 'FLOAT':
-                                value = LFloat32('float').parse(field_data)
-                            elif field.type == 'DOUBLE':
-                                value = LFloat64('double').parse(field_data)
-                            elif field.type == 'DECIMAL':
-                                # TODO BCD
-                                if field_data[0] & 0xF0 == 0xF0:
-                                    sign = -1
-                                    field_data = bytearray(field_data)
-                                    field_data[0] &= 0x0F
-                                else:
-                                    sign = 1
-                                value = sign * int(hexlify(field_data)) / 10 ** field.decimal_count
-                            elif field.type == 'STRING':
-                                value = text_type(field_data, encoding=self.encoding).strip()
-                            elif field.type == 'CSTRING':
-                                value = text_type(field_data, encoding=self.encoding).strip()
-                            elif field.type == 'PSTRING':
-                                value = text_type(field_data[1:field_data[0] + 1], encoding=self.encoding).strip()
-                            else:
-                                # GROUP=0x16
-                                # raise ValueError
-                                #TODO
-                                pass
-
-                            fields[text_type(field.name)] = value
-                        # print(fields)
-                        yield fields
+        for record in page_records(self, self.pages.leaf(low), check=self.check):
+            if record.type == 'DATA' and record.data_bytes[2:2 + len(key)] == key:
+                return self.__fields(record, table_definition)
+        return None
+
+    def validate(self, processes=None):
+        """
+        Check file integrity without warnings, see tpsvalidate.validate. Return TpsValidationReport.
+        """
+        # tpsvalidate imports this module
+        from .tpsvalidate import validate
+        return validate(self, processes=processes)
+
+    def __fields(self, record, table_definition):
+        # TODO convert name to string
+        fields = {"b':RecNo'": record.data.record_number}
+        for field in table_definition.record_table_definition_field:
+            field_data = record.data.data[field.offset:field.offset + field.size]
+            value = ''
+            if field.type == 'BYTE':
+                value = ULInt8('byte').parse(field_data)
+            elif field.type == 'SHORT':
+                value = SLInt16('short').parse(field_data)
+            elif field.type == 'USHORT':
+                value = ULInt16('ushort').parse(field_data)
+            elif field.type == 'DATE':
+                value = self.to_date(field_data)
+            elif field.type == 'TIME':
+                value = self.to_time(field_data)
+            elif field.type == 'LONG':
+                #TODO
+                if field.name.decode(encoding='cp437').split(':')[1].lower() in self.date_fieldname:
+                    if SLInt32('long').parse(field_data) == 0:
+                        value = None
+                    else:
+                        value = date.fromordinal(657433 + SLInt32('long').parse(field_data))
+                elif field.name.decode(encoding='cp437').split(':')[1].lower() in self.time_fieldname:
+                    s, ms = divmod(SLInt32('long').parse(field_data), 100)
+                    value = str('{}.{:03d}'.format(time.strftime('%Y-%m-%d %H:%M:%S',
+                                                                 time.gmtime(s)), ms))
+                else:
+                    value = SLInt32('long').parse(field_data)
+            elif field.type == 'ULONG':
+                value = ULInt32('ulong').parse(field_data)
+            elif field.type == 'FLOAT':
+                value = LFloat32('float').parse(field_data)
+            elif field.type == 'DOUBLE':
+                value = LFloat64('double').parse(field_data)
+            elif field.type == 'DECIMAL':
+                # TODO BCD
+                if field_data[0] & 0xF0 == 0xF0:
+                    sign = -1
+                    field_data = bytearray(field_data)
+                    field_data[0] &= 0x0F
+                else:
+                    sign = 1
+                value = sign * int(hexlify(field_data)) / 10 ** field.decimal_count
+            elif field.type == 'STRING':
+                value = text_type(field_data, encoding=self.encoding).strip()
+            elif field.type == 'CSTRING':
+                value = text_type(field_data, encoding=self.encoding).strip()
+            elif field.type == 'PSTRING':
+                value = text_type(field_data[1:field_data[0] + 1], encoding=self.encoding).strip()
+            else:
+                # GROUP=0x16
+                # raise ValueError
+                #TODO
+                pass
+
+            fields[text_type(field.name)] = value
+        return fields
 
     def set_current_table(self, tablename):
         self.current_table_number = self.tables.get_number(tablename)
@@ -201,7 +331,7 @@ class TPS:
 
     def to_time(self, value):
         value_time = TIME_STRUCT.parse(value)
-        return time(value_time.hour, value_time.minute, value_time.second, value_time.centisecond * 10000)
+        return datetime_time(value_time.hour, value_time.minute, value_time.second, value_time.centisecond * 10000)
 
         # metadata
         # ?header
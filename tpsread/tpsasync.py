@@ -0,0 +1,188 @@
+"""
+asyncio API to read TPS files
+
+Opening, page I/O, decryption, decompression and decoding run on a shared bounded
+executor; scans hand rows over in batches, so there is one await per batch.
+Every row carries the scan cursor after it, so a scan can be resumed from any row.
+Opened files are shared through the process-wide TpsCatalog.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .tps import TPS
+from .tpscatalog import CATALOG
+
+
+# Worker threads of the shared executor
+EXECUTOR_WORKERS = 4
+
+# Rows read in the executor per await
+BATCH_SIZE = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Shared executor of all AsyncTPS files
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='tpsread')
+        return _executor
+
+
+def _next_batch(scan, batch_size):
+    # (row, cursor after the row) pairs
+    batch = []
+    for row in scan:
+        batch.append((row, scan.cursor))
+        if len(batch) >= batch_size:
+            break
+    return batch
+
+
+def _close_scan(future, scan):
+    # a generator can not be closed while it runs: wait for the batch being read
+    if future is not None and not future.cancel():
+        concurrent.futures.wait([future])
+    scan.close()
+
+
+class AsyncTpsScan:
+    """
+    Asynchronous iterator over records of a scan, read in the executor batch_size at a time.
+
+    cursor points to the record following the last one yielded (by __anext__ or next_batch),
+    so cursor.token resumes the scan after it, see TPS.iter_from.
+    """
+
+    def __init__(self, tps, executor, batch_size=BATCH_SIZE, token=None):
+        self.executor = executor
+        self.batch_size = batch_size
+        self.cursor = None
+        self.__scan = tps.iter_from(token)
+        # batch being read in the executor, kept when the call waiting for it is cancelled
+        self.__future = None
+        self.__batch = []
+        self.__position = 0
+        self.__closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.__position >= len(self.__batch):
+            self.__batch = await self.__read_batch()
+            self.__position = 0
+            if not self.__batch:
+                self.close()
+                raise StopAsyncIteration
+        row, self.cursor = self.__batch[self.__position]
+        self.__position += 1
+        return row
+
+    async def next_batch(self):
+        """
+        List of up to batch_size next records, empty at the end of the scan
+        """
+        batch = self.__batch[self.__position:]
+        if not batch:
+            batch = await self.__read_batch()
+        self.__batch = []
+        self.__position = 0
+        if batch:
+            self.cursor = batch[-1][1]
+        else:
+            self.close()
+        return [row for row, cursor in batch]
+
+    async def __read_batch(self):
+        if self.__closed:
+            return []
+        # one read per scan: a read left by a cancelled call (e.g. a timeout) is awaited again
+        if self.__future is None:
+            self.__future = self.executor.submit(_next_batch, self.__scan, self.batch_size)
+        try:
+            batch = await asyncio.shield(asyncio.wrap_future(self.__future))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.__future = None
+            raise
+        self.__future = None
+        return batch
+
+    def close(self):
+        """
+        Stop the scan; the scan is closed in the executor once a batch being read is done
+        """
+        if not self.__closed:
+            self.__closed = True
+            return self.executor.submit(_close_scan, self.__future, self.__scan)
+        return None
+
+    async def aclose(self):
+        future = self.close()
+        if future is not None:
+            await asyncio.wrap_future(future)
+
+
+class AsyncTPS:
+    """
+    TPS file for asyncio code, opened with await AsyncTPS.open(filename, **kwargs)
+    """
+
+    def __init__(self, tps, executor=None):
+        self.tps = tps
+        if executor is None:
+            executor = get_executor()
+        self.executor = executor
+
+    @classmethod
+    async def open(cls, filename, executor=None, catalog=CATALOG, **kwargs):
+        """
+        Open TPS file filename (kwargs are passed to TPS), sharing an opened file of catalog
+        """
+        if executor is None:
+            executor = get_executor()
+        loop = asyncio.get_running_loop()
+        if catalog is None:
+            tps = await loop.run_in_executor(executor, functools.partial(TPS, filename, **kwargs))
+        else:
+            tps = await loop.run_in_executor(executor, functools.partial(catalog.open, filename, **kwargs))
+        return cls(tps, executor)
+
+    async def batches(self, batch_size=BATCH_SIZE, token=None):
+        """
+        (records, token) of up to batch_size records of the current table: token resumes the scan
+        after the last record of the batch, see TPS.iter_from
+        """
+        scan = self.scan(batch_size, token)
+        try:
+            while True:
+                batch = await scan.next_batch()
+                if not batch:
+                    return
+                yield batch, scan.cursor.token
+        finally:
+            scan.close()
+
+    def scan(self, batch_size=BATCH_SIZE, token=None):
+        """
+        AsyncTpsScan of records of the current table: async for row in tps.scan()
+        """
+        return AsyncTpsScan(self.tps, self.executor, batch_size, token)
+
+    async def get(self, record_number):
+        """
+        Record of the current table with record_number, or None, see TPS.get
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.tps.get, record_number)
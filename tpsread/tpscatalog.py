@@ -0,0 +1,112 @@
+"""
+Process-wide catalog of opened TPS files
+
+The catalog keeps one opened TPS per file (path, modification time, size, header
+change_count) and options that affect parsing (encoding, password, decryptor class, check).
+Files opened through the catalog share its file mapping, header, page tree, tables
+and decryptor keys; only per-instance state (page cache, current table, scan cursor)
+is created again.
+"""
+
+import os.path
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .tps import HEADER_STRUCT, TPS
+from .tpscrypt import TpsDecryptor
+
+
+# Opened files kept by a catalog
+MAX_OPEN_FILES = 64
+
+
+class TpsCatalogEntry:
+    def __init__(self, mtime, size, tps):
+        self.mtime = mtime
+        self.size = size
+        self.tps = tps
+
+    @property
+    def change_count(self):
+        return self.tps.header.change_count
+
+
+class TpsCatalog:
+    """
+    Opened TPS files shared between TPS instances and threads.
+
+    The catalog keeps at most max_open entries and drops the least recently used. Dropping an entry
+    does not close its file: the mapping stays open while TPS instances returned for it are alive.
+    """
+
+    def __init__(self, max_open=MAX_OPEN_FILES):
+        self.max_open = max_open
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def open(self, filename, encoding=None, password=None, decryptor_class=TpsDecryptor, check=False, **kwargs):
+        """
+        TPS of filename (kwargs are passed to TPS), sharing parsed file state with other opens of the file.
+
+        Buffers and file-like objects are opened without the catalog.
+        """
+        if not isinstance(filename, str) and not hasattr(filename, '__fspath__'):
+            return TPS(filename, encoding=encoding, password=password, decryptor_class=decryptor_class, check=check,
+                       **kwargs)
+
+        filename = os.path.abspath(os.fspath(filename))
+        stat = os.stat(filename)
+        # page tree and tables are checked while parsed
+        key = (filename, encoding, password, decryptor_class, check)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+
+        if entry is not None and not self.__iscurrent(entry, stat):
+            entry = None
+        if entry is None:
+            shared = TPS(filename, encoding=encoding, password=password, decryptor_class=decryptor_class,
+                         cached=False, check=check)
+            if not hasattr(shared, 'tables'):
+                # bad cryptographic keys
+                return shared
+            entry = TpsCatalogEntry(stat.st_mtime_ns, stat.st_size, shared)
+            with self.__lock:
+                self.__entries[key] = entry
+                self.__entries.move_to_end(key)
+                while len(self.__entries) > self.max_open:
+                    # file is closed when the last TPS using it is gone
+                    self.__entries.popitem(last=False)
+
+        return TPS(filename, encoding=encoding, password=password, decryptor_class=decryptor_class, check=check,
+                   shared=entry.tps, **kwargs)
+
+    def __iscurrent(self, entry, stat):
+        if entry.mtime != stat.st_mtime_ns or entry.size != stat.st_size:
+            return False
+        # file changed in place within mtime resolution
+        header = HEADER_STRUCT.parse(entry.tps.read(0x200, 0))
+        return header.change_count == entry.change_count
+
+    def scan_dir(self, directory, workers=None, **kwargs):
+        """
+        Open all .tps files of directory concurrently, return {file name: TPS}
+        """
+        filenames = sorted(filename for filename in os.listdir(directory) if filename.lower().endswith('.tps'))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            opened = executor.map(lambda filename: self.open(os.path.join(directory, filename), **kwargs),
+                                  filenames)
+            return dict(zip(filenames, opened))
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+# Process-wide catalog
+CATALOG = TpsCatalog()
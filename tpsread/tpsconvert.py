@@ -0,0 +1,287 @@
+"""
+Convert TPS files to SQLite databases or Parquet files
+
+All tables of a file are written in a single pass over its pages, in batches
+(executemany for SQLite, row groups for Parquet). SQLite tables get indexes
+mirroring the TPS KEY/INDEX definitions. Parquet output needs pyarrow.
+"""
+
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .tps import TPS
+
+
+# Rows per executemany call / Parquet row group
+BATCH_SIZE = 10000
+
+# Record number column, see TPS.iter_from
+RECNO_KEY = "b':RecNo'"
+
+SQL_TYPES = {'BYTE': 'INTEGER',
+             'SHORT': 'INTEGER',
+             'USHORT': 'INTEGER',
+             'LONG': 'INTEGER',
+             'ULONG': 'INTEGER',
+             'FLOAT': 'REAL',
+             'DOUBLE': 'REAL',
+             'DECIMAL': 'NUMERIC',
+             'DATE': 'DATE',
+             'TIME': 'TIME',
+             'STRING': 'TEXT',
+             'CSTRING': 'TEXT',
+             'PSTRING': 'TEXT', }
+
+
+def parquet_type(column_type):
+    return {'BYTE': pyarrow.uint8(),
+            'SHORT': pyarrow.int16(),
+            'USHORT': pyarrow.uint16(),
+            'LONG': pyarrow.int32(),
+            'ULONG': pyarrow.uint32(),
+            'FLOAT': pyarrow.float32(),
+            'DOUBLE': pyarrow.float64(),
+            # TPS.iter_from decodes DECIMAL as float
+            'DECIMAL': pyarrow.float64(),
+            'DATE': pyarrow.date32(),
+            'TIME': pyarrow.time64('us'),
+            'STRING': pyarrow.string(),
+            'CSTRING': pyarrow.string(),
+            'PSTRING': pyarrow.string(), }[column_type]
+
+
+class TpsColumn:
+    def __init__(self, name, key, column_type):
+        self.name = name
+        # key in TPS.iter_from fields
+        self.key = key
+        # TPS field type of the decoded value
+        self.type = column_type
+
+
+class TpsConvertTable:
+    """
+    Output table of a TPS table: name, columns and KEY/INDEX definitions
+    """
+
+    def __init__(self, tps, number, table_names=None):
+        """
+        table_names: lower case names of other output tables, the name of this table is made unique and added
+        """
+        self.number = number
+        definition = tps.tables.get_definition(number)
+
+        base_name = tps.tables.get_name(number)
+        if base_name in ('', 'UNNAMED'):
+            base_name = tps.name or 'table'
+        if table_names is None:
+            table_names = set()
+        self.name = base_name
+        i = 1
+        while self.name.lower() in table_names:
+            i += 1
+            self.name = '{0}_{1}'.format(base_name, i)
+        table_names.add(self.name.lower())
+
+        self.columns = [TpsColumn('RecNo', RECNO_KEY, 'ULONG')]
+        # column by field number (field.number), None for not converted fields
+        field_columns = {}
+        names = {'recno'}
+        for field in definition.record_table_definition_field:
+            if field.type not in SQL_TYPES:
+                # GROUP
+                field_columns[field.number] = None
+                continue
+            key = str(field.name)
+            columns = [column for column in self.columns if column.key == key]
+            if columns:
+                # fields with the same name share one value in TPS.iter_from fields
+                field_columns[field.number] = columns[0]
+                continue
+            field_name = field.name.decode(encoding='cp437').split(':')[-1]
+            column_type = field.type
+            if field.type == 'LONG' and field_name.lower() in tps.date_fieldname:
+                column_type = 'DATE'
+            elif field.type == 'LONG' and field_name.lower() in tps.time_fieldname:
+                column_type = 'STRING'
+            # same names after prefix removal
+            column_name = field_name
+            i = 1
+            while column_name.lower() in names:
+                i += 1
+                column_name = '{0}_{1}'.format(field_name, i)
+            names.add(column_name.lower())
+            column = TpsColumn(column_name, key, column_type)
+            field_columns[field.number] = column
+            self.columns.append(column)
+
+        # (index name, unique, [(column name, descending, nocase)])
+        self.indexes = []
+        for index in definition.record_table_definition_index:
+            if index.type not in ('KEY', 'INDEX'):
+                continue
+            index_columns = []
+            for index_field in index.index_field_propertly:
+                if field_columns.get(index_field.field_number) is None:
+                    break
+                column = field_columns[index_field.field_number]
+                index_columns.append((column.name, index_field.field_order_type == 'DESCENDING',
+                                      index.NOCASE and column.type in ('STRING', 'CSTRING', 'PSTRING')))
+            else:
+                if index_columns:
+                    index_name = index.name.decode(encoding='cp437').split(':')[-1]
+                    # KEY without DUP does not allow duplicates
+                    unique = index.type == 'KEY' and not index.DUP
+                    self.indexes.append(('{0}_{1}'.format(self.name, index_name), unique, index_columns))
+
+    def row(self, fields):
+        return tuple(fields[column.key] for column in self.columns)
+
+
+def quote(name):
+    return '"{0}"'.format(name.replace('"', '""'))
+
+
+class SqliteWriter:
+    """
+    Write tables to SQLite database filename, in a single transaction
+    """
+
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('PRAGMA synchronous = OFF')
+        self.connection.execute('PRAGMA journal_mode = OFF')
+
+    def create_table(self, table):
+        self.connection.execute('DROP TABLE IF EXISTS {0}'.format(quote(table.name)))
+        self.connection.execute('CREATE TABLE {0} ({1})'.format(
+            quote(table.name),
+            ', '.join('{0} {1}'.format(quote(column.name), SQL_TYPES[column.type]) for column in table.columns)))
+
+    def write(self, table, rows):
+        converted = [i for i, column in enumerate(table.columns) if column.type in ('DATE', 'TIME')]
+        if converted:
+            rows = [list(row) for row in rows]
+            for row in rows:
+                for i in converted:
+                    if row[i] is not None:
+                        row[i] = row[i].isoformat()
+        self.connection.executemany('INSERT INTO {0} VALUES ({1})'.format(
+            quote(table.name), ', '.join('?' * len(table.columns))), rows)
+
+    def create_indexes(self, table):
+        for index_name, unique, index_columns in table.indexes:
+            self.connection.execute('CREATE {0}INDEX {1} ON {2} ({3})'.format(
+                'UNIQUE ' if unique else '', quote(index_name), quote(table.name),
+                ', '.join(quote(name) + (' COLLATE NOCASE' if nocase else '') + (' DESC' if descending else '')
+                          for name, descending, nocase in index_columns)))
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class ParquetWriter:
+    """
+    Write each table to directory/<table name>.parquet, a row group per batch
+    """
+
+    def __init__(self, directory):
+        if pyarrow is None:
+            raise ImportError('Parquet output requires pyarrow')
+        self.directory = directory
+        self.writers = {}
+        self.schemas = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def create_table(self, table):
+        schema = pyarrow.schema([(column.name, parquet_type(column.type)) for column in table.columns])
+        self.schemas[table.name] = schema
+        self.writers[table.name] = pyarrow.parquet.ParquetWriter(
+            os.path.join(self.directory, table.name + '.parquet'), schema)
+
+    def write(self, table, rows):
+        schema = self.schemas[table.name]
+        arrays = [pyarrow.array(values, type=schema.field(i).type) for i, values in enumerate(zip(*rows))]
+        self.writers[table.name].write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+
+    def create_indexes(self, table):
+        # no indexes in Parquet
+        pass
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+WRITERS = {'sqlite': SqliteWriter,
+           'parquet': ParquetWriter, }
+
+EXTENSIONS = {'sqlite': '.sqlite',
+              'parquet': '', }
+
+
+def convert(tps, output, output_format='sqlite', batch_size=BATCH_SIZE):
+    """
+    Write all tables of an opened TPS file to output: SQLite database file or Parquet directory
+    """
+    if output_format not in WRITERS:
+        raise ValueError('Unknown output format: {0}'.format(output_format))
+    writer = WRITERS[output_format](output)
+    try:
+        tables = {}
+        batches = {}
+        table_names = set()
+        for number in tps.tables.list():
+            tables[number] = TpsConvertTable(tps, number, table_names)
+            batches[number] = []
+            writer.create_table(tables[number])
+
+        for number, fields in tps.iter_tables():
+            batch = batches[number]
+            batch.append(tables[number].row(fields))
+            if len(batch) >= batch_size:
+                writer.write(tables[number], batch)
+                batches[number] = []
+
+        for number, batch in batches.items():
+            if batch:
+                writer.write(tables[number], batch)
+        for table in tables.values():
+            writer.create_indexes(table)
+    finally:
+        writer.close()
+    return output
+
+
+def convert_file(filename, output, output_format='sqlite', batch_size=BATCH_SIZE, **kwargs):
+    """
+    Open TPS file filename (kwargs are passed to TPS) and convert it to output
+    """
+    return convert(TPS(filename, cached=False, **kwargs), output, output_format, batch_size)
+
+
+def convert_dir(directory, output_directory, output_format='sqlite', batch_size=BATCH_SIZE, processes=None,
+                **kwargs):
+    """
+    Convert every .tps file of directory to output_directory over a process pool.
+
+    Each file is converted to its own <name>.sqlite database or <name> Parquet directory.
+    Return list of outputs.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    filenames = sorted(filename for filename in os.listdir(directory) if filename.lower().endswith('.tps'))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = []
+        for filename in filenames:
+            output = os.path.join(output_directory, os.path.splitext(filename)[0] + EXTENSIONS[output_format])
+            futures.append(executor.submit(convert_file, os.path.join(directory, filename), output,
+                                           output_format, batch_size, **kwargs))
+        return [future.result() for future in futures]
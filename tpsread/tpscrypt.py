@@ -2,12 +2,39 @@
 Cryptographic Module for TPS File
 """
 
+from functools import lru_cache
+
 from construct import Array, GreedyRange, ULInt32
 
 
+CHUNK_DATA_STRUCT = Array(16, ULInt32('data'))
+
+
+@lru_cache(maxsize=64)
+def derive_keys(password):
+    """
+    Keys of password (bytes with trailing zero), shared by all files with the same password
+    """
+    byte_keys = [0] * 64
+
+    for i in range(64):
+        byte_keys[(i * 0x11) & 0x3F] = (i + password[(i + 1) % len(password)]) & 0xFF
+
+    keys = CHUNK_DATA_STRUCT.parse(bytes(byte_keys))
+
+    for i in range(2):
+        for pos_a in range(16):
+            data_a = keys[pos_a]
+            pos_b = data_a & 0x0F
+            data_b = keys[pos_b]
+            keys[pos_b] = (data_a + (data_a & data_b)) & 0xFFFFFFFF
+            keys[pos_a] = ((data_a | data_b) + data_a) & 0xFFFFFFFF
+    return tuple(keys)
+
+
 class TpsDecryptor:
 
-    CHUNK_DATA_STRUCT = Array(16, ULInt32('data'))
+    CHUNK_DATA_STRUCT = CHUNK_DATA_STRUCT
     DATA_STRUCT = GreedyRange(CHUNK_DATA_STRUCT)
 
     def __init__(self, file, password, encoding='utf-8'):
@@ -17,22 +44,7 @@ class TpsDecryptor:
             self.password = password
         else:
             self.password = bytes(password, encoding=self.encoding) + b'\x00'
-            self.keys = []
-
-            byte_keys = [0] * 64
-
-            for i in range(64):
-                byte_keys[(i * 0x11) & 0x3F] = (i + self.password[(i + 1) % len(self.password)]) & 0xFF
-
-            self.keys = self.CHUNK_DATA_STRUCT.parse(bytes(byte_keys))
-
-            for i in range(2):
-                for pos_a in range(16):
-                    data_a = self.keys[pos_a]
-                    pos_b = data_a & 0x0F
-                    data_b = self.keys[pos_b]
-                    self.keys[pos_b] = (data_a + (data_a & data_b)) & 0xFFFFFFFF
-                    self.keys[pos_a] = ((data_a | data_b) + data_a) & 0xFFFFFFFF
+            self.keys = list(derive_keys(self.password))
 
     def decrypt(self, size, pos=None):
         if pos is None:
@@ -0,0 +1,53 @@
+"""
+Position of a scan in a TPS file
+"""
+
+
+class TpsCursor:
+    """
+    Data page ref and record index within that page, bound to the file state (header change_count)
+    and table number. Serialised as a checkpoint token.
+    """
+
+    def __init__(self, change_count, table_number, page_ref, record_index):
+        self.change_count = change_count
+        self.table_number = table_number
+        self.page_ref = page_ref
+        self.record_index = record_index
+
+    @property
+    def token(self):
+        return '{0:x}.{1:x}.{2:x}.{3:x}'.format(self.change_count, self.table_number, self.page_ref,
+                                                self.record_index)
+
+    @classmethod
+    def from_token(cls, token):
+        try:
+            change_count, table_number, page_ref, record_index = [int(value, 16) for value in token.split('.')]
+        except (AttributeError, ValueError):
+            raise ValueError('Bad checkpoint token: {0!r}'.format(token))
+        return cls(change_count, table_number, page_ref, record_index)
+
+    def __repr__(self):
+        return 'TpsCursor({0!r})'.format(self.token)
+
+
+class TpsScan:
+    """
+    Iterator over records of a scan, see TPS.iter_from. cursor points to the record following
+    the last one yielded, so cursor.token resumes the scan after it.
+    """
+
+    def __init__(self):
+        self.cursor = None
+        self.rows = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.rows)
+
+    def close(self):
+        # stops the prefetch thread of an unfinished scan
+        self.rows.close()
@@ -0,0 +1,112 @@
+"""
+Sources of TPS file data: local path, bytes-like object, mmap or seekable file-like object
+"""
+
+import os.path
+import mmap
+
+
+# Pages are addressed in 0x100 bytes units (page ref * 0x100 + header size)
+PAGE_GRANULARITY = 0x100
+
+# Default read-ahead for file-like objects
+READ_AHEAD_SIZE = PAGE_GRANULARITY * 0x40
+
+
+class TpsBuffer:
+    """
+    File interface (read, seek, tell) over a bytes-like object or mmap, without copying it
+    """
+
+    def __init__(self, data):
+        self.__data = memoryview(data)
+        self.__pos = 0
+
+    def read(self, size=-1):
+        if size < 0:
+            size = len(self.__data) - self.__pos
+        result = self.__data[self.__pos:self.__pos + size].tobytes()
+        self.__pos += len(result)
+        return result
+
+    def seek(self, pos):
+        self.__pos = pos
+
+    def tell(self):
+        return self.__pos
+
+    def size(self):
+        return len(self.__data)
+
+
+class TpsFileReader:
+    """
+    File interface (read, seek, tell) over a seekable file-like object with a block-aligned read-ahead buffer
+
+    Opening a file walks the page tree, which seeks backwards. Compressed streams (e.g. ZipExtFile) decompress
+    from the start on every backward seek, so opening is slow; read_ahead >= file size reads such a stream once.
+    """
+
+    def __init__(self, file, read_ahead=READ_AHEAD_SIZE):
+        self.file = file
+        # round up to page granularity
+        self.read_ahead = max(PAGE_GRANULARITY, (read_ahead + PAGE_GRANULARITY - 1) & ~(PAGE_GRANULARITY - 1))
+        self.__pos = 0
+        self.__buffer = b''
+        self.__buffer_pos = 0
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.size() - self.__pos
+        start = self.__pos - self.__buffer_pos
+        if start < 0 or start + size > len(self.__buffer):
+            self.__fill(self.__pos, size)
+            start = self.__pos - self.__buffer_pos
+        result = self.__buffer[start:start + size]
+        self.__pos += len(result)
+        return result
+
+    def __fill(self, pos, size):
+        self.__buffer_pos = pos & ~(PAGE_GRANULARITY - 1)
+        end_pos = max(pos + size, self.__buffer_pos + self.read_ahead)
+        end_pos = (end_pos + PAGE_GRANULARITY - 1) & ~(PAGE_GRANULARITY - 1)
+        self.file.seek(self.__buffer_pos)
+        self.__buffer = self.file.read(end_pos - self.__buffer_pos)
+
+    def seek(self, pos):
+        self.__pos = pos
+
+    def tell(self):
+        return self.__pos
+
+    def size(self):
+        self.file.seek(0, os.SEEK_END)
+        return self.file.tell()
+
+
+def open_source(source, read_ahead=READ_AHEAD_SIZE):
+    """
+    Return (file, file size, file name, path) for a path, bytes-like object, mmap or seekable file-like object.
+path is the local file path, None for buffers and file-like objects (their file name is their name attribute).
+
+    bytes without zero bytes are a path (file data starts with a zero header offset, paths can not contain zeros).
+    """
+    if isinstance(source, bytes) and b'\x00' not in source:
+        source = os.fsdecode(source)
+    if isinstance(source, str) or hasattr(source, '__fspath__'):
+        filename = os.fspath(source)
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(filename)
+        with open(filename, mode='rb') as tpsfile:
+            tps_file = mmap.mmap(tpsfile.fileno(), 0, access=mmap.ACCESS_READ)
+        return tps_file, tps_file.size(), filename, filename
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        tps_file = TpsBuffer(source)
+        return tps_file, tps_file.size(), '', None
+    if hasattr(source, 'read') and hasattr(source, 'seek'):
+        tps_file = TpsFileReader(source, read_ahead)
+        filename = getattr(source, 'name', '')
+        if not isinstance(filename, str):
+            filename = ''
+        return tps_file, tps_file.size(), filename, None
+    raise TypeError('Unsupported TPS source: {0!r}'.format(type(source)))
@@ -29,12 +29,13 @@ class TpsPage:
         self.check = check
         self.__page_child_ref = []
 
-        self.tps.seek(ref * 0x100 + self.tps.header.size)
-        page = PAGE_HEADER_STRUCT.parse(self.tps.read(PAGE_HEADER_STRUCT.sizeof()))
+        # reads with positions: the file position is shared with other readers of the file
+        pos = ref * 0x100 + self.tps.header.size
+        page = PAGE_HEADER_STRUCT.parse(self.tps.read(PAGE_HEADER_STRUCT.sizeof(), pos))
 
         if page.hierarchy_level != 0:
             page.data = Array(lambda ctx: page.record_count, ULInt32('page_child_ref')).parse(
-                self.tps.read(page.size - PAGE_HEADER_STRUCT.sizeof()))
+                self.tps.read(page.size - PAGE_HEADER_STRUCT.sizeof(), pos + PAGE_HEADER_STRUCT.sizeof()))
 
         self.offset = page.offset
         self.size = page.size
@@ -59,11 +60,15 @@ class TpsPage:
 
 class TpsPagesList:
     # tree-like structure
-    def __init__(self, tps, root_ref, check=False):
+    def __init__(self, tps, root_ref, check=False, errors=None):
+        # errors: if a dict, pages that can not be read are left out of the tree and
+        # their errors are stored by page ref instead of raised
         self.tps = tps
         self.root_page_ref = root_ref
         self.check = check
+        self.errors = errors
         self.__pages = {}
+        self.__leaf_refs = []
 
         self.__add(self.root_page_ref, check=self.check)
 
@@ -74,14 +79,28 @@ class TpsPagesList:
                 for child_page_ref in self.__pages[current_page_ref].children:
                     new_page = self.__add(child_page_ref, parent_ref=current_page_ref, check=self.check)
                     # check page inside block
-                    if self.check:
+                    if self.check and new_page is not None:
                         new_page_end_ref = (new_page.offset + new_page.size - self.tps.header.size) / 0x100
                         if not self.tps.block_contains(child_page_ref, new_page_end_ref):
                             warn('Not exist block, that contains page ref# {page_ref}'
                                  .format(page_ref=child_page_ref))
 
     def __add(self, ref, parent_ref=None, check=False):
-        page = TpsPage(self.tps, ref, parent_ref, check)
+        if ref in self.__pages:
+            if self.errors is not None:
+                self.errors[ref] = 'Page is referenced twice (parent page ref# {parent_ref})'.format(
+                    parent_ref=parent_ref)
+            return None
+        try:
+            if ref * 0x100 + self.tps.header.size + PAGE_HEADER_STRUCT.sizeof() > self.tps.file_size:
+                raise ValueError('Page ref# {page_ref} is beyond the end of file'.format(page_ref=ref))
+            page = TpsPage(self.tps, ref, parent_ref, check)
+        except Exception as e:
+            if self.errors is None:
+                raise
+            self.errors[ref] = 'Page can not be read (parent page ref# {parent_ref}): {error}'.format(
+                parent_ref=parent_ref, error=e)
+            return None
 
         if self.check:
             intersection_page = self.__intersection(ref, page.size)
@@ -90,19 +109,46 @@ class TpsPagesList:
                      .format(page_ref1=ref, page_ref2=intersection_page.ref))
 
         self[ref] = page
+        if page.hierarchy_level == 0:
+            self.__leaf_refs.append(ref)
 
         return page
 
     def list(self):
         return list(self.__pages)
 
+    def leaves(self, start_ref=None):
+        # data pages in tree order, optionally starting from page start_ref
+        if start_ref is None:
+            start = 0
+        else:
+            if start_ref not in self.__pages or self.__pages[start_ref].hierarchy_level != 0:
+                raise ValueError('Page ref# {page_ref} is not a data page'.format(page_ref=start_ref))
+            start = self.__leaf_refs.index(start_ref)
+        return (self.__pages[ref] for ref in self.__leaf_refs[start:])
+
+    def leaf(self, index):
+        # data page by its number in tree order
+        return self.__pages[self.__leaf_refs[index]]
+
+    def leaf_count(self):
+        return len(self.__leaf_refs)
+
     def __generator(self, ref):
+        # pages of the tree, depth first; pages not read are skipped
+        if ref not in self.__pages:
+            return
         yield ref
+        visited = {ref}
         queue = self[ref].children
         while queue:
-            yield queue[0]
-            expansion = self[queue[0]].children
-            queue = expansion + queue[1:]
+            ref = queue[0]
+            queue = queue[1:]
+            if ref in visited or ref not in self.__pages:
+                continue
+            visited.add(ref)
+            yield ref
+            queue = self[ref].children + queue
 
     def __intersection(self, ref, size):
         start_offset = ref * 0x100 + self.tps.header.size
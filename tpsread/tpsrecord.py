@@ -69,6 +69,90 @@ class TpsRecord:
             self.type = self.data.type
 
 
+def read_page_data(tps, tps_page, check=False):
+    """
+    Read, decrypt and decompress records data of data page tps_page
+    """
+    data = tps.read(tps_page.size - PAGE_HEADER_STRUCT.sizeof(),
+                    tps_page.ref * 0x100 + tps.header.size + PAGE_HEADER_STRUCT.sizeof())
+
+    if tps_page.uncompressed_size > tps_page.size:
+        data = uncompress(data)
+
+        if check:
+            check_value('record_data.size', len(data) + PAGE_HEADER_STRUCT.sizeof(),
+                        tps_page.uncompressed_size)
+    return data
+
+
+def uncompress(data):
+    pos = 0
+    result = bytearray()
+    while pos < len(data):
+        repeat_rel_offset = data[pos]
+        pos += 1
+
+        if repeat_rel_offset > 0x7F:
+            # size repeat_count = 2 bytes
+            repeat_rel_offset = ((data[pos] << 8) + ((repeat_rel_offset & 0x7F) << 1)) >> 1
+            pos += 1
+
+        result += data[pos:pos + repeat_rel_offset]
+        pos += repeat_rel_offset
+
+        if pos < len(data):
+            repeat_byte = bytes(result[-1:])
+            repeat_count = data[pos]
+            pos += 1
+
+            if repeat_count > 0x7F:
+                repeat_count = ((data[pos] << 8) + ((repeat_count & 0x7F) << 1)) >> 1
+                pos += 1
+
+            result += repeat_byte * repeat_count
+    return bytes(result)
+
+
+def iter_records(data):
+    """
+    Records of decompressed page data. Each record shares its first bytes with the previous one.
+    """
+    # record buffer: data_size (2 bytes) + record data, reused between records
+    record_data = bytearray(2)
+    pos = 0
+    record_size = 0
+    record_header_size = 0
+
+    while pos < len(data):
+        byte_counter = data[pos]
+        pos += 1
+        if (byte_counter & 0x80) == 0x80:
+            record_size = data[pos + 1] * 0x100 + data[pos]
+            record_data[0:2] = data[pos:pos + 2]
+            pos += 2
+        if (byte_counter & 0x40) == 0x40:
+            record_header_size = data[pos + 1] * 0x100 + data[pos]
+            pos += 2
+        byte_counter &= 0x3F
+        new_data_size = record_size - byte_counter
+        record_data[2 + byte_counter:] = data[pos:pos + new_data_size]
+        yield TpsRecord(record_header_size, bytes(record_data))
+        pos += new_data_size
+
+
+def page_records(tps, tps_page, check=False):
+    """
+    Records of data page tps_page: cached list, or a generator over the decompressed page data
+    """
+    if tps_page.ref in tps.cache_pages:
+        return tps.cache_pages[tps_page.ref]
+    records = iter_records(read_page_data(tps, tps_page, check))
+    if tps.cached:
+        records = list(records)
+        tps.cache_pages[tps_page.ref] = records
+    return records
+
+
 class TpsRecordsList:
     def __init__(self, tps, tps_page, encoding=None, check=False):
         self.tps = tps
@@ -80,69 +164,11 @@ class TpsRecordsList:
         self.__records = []
 
         if self.tps_page.hierarchy_level == 0:
-            if self.tps_page.ref in self.tps.cache_pages:
-                self.__records = tps.cache_pages[self.tps_page.ref]
+            records = page_records(self.tps, self.tps_page, self.check)
+            if isinstance(records, list):
+                self.__records = records
             else:
-                data = self.tps.read(self.tps_page.size - PAGE_HEADER_STRUCT.sizeof(),
-                                     self.tps_page.ref * 0x100 + self.tps.header.size + PAGE_HEADER_STRUCT.sizeof())
-
-                if self.tps_page.uncompressed_size > self.tps_page.size:
-                    data = self.__uncompress(data)
-
-                    if self.check:
-                        check_value('record_data.size', len(data) + PAGE_HEADER_STRUCT.sizeof(),
-                                    tps_page.uncompressed_size)
-
-                record_data = b''
-                pos = 0
-                record_size = 0
-                record_header_size = 0
-
-                while pos < len(data):
-                    byte_counter = data[pos]
-                    pos += 1
-                    if (byte_counter & 0x80) == 0x80:
-                        record_size = data[pos + 1] * 0x100 + data[pos]
-                        pos += 2
-                    if (byte_counter & 0x40) == 0x40:
-                        record_header_size = data[pos + 1] * 0x100 + data[pos]
-                        pos += 2
-                    byte_counter &= 0x3F
-                    new_data_size = record_size - byte_counter
-                    record_data = record_data[:byte_counter] + data[pos:pos + new_data_size]
-                    self.__records.append(TpsRecord(record_header_size, ULInt16('data_size').build(record_size)
-                                                    + record_data))
-                    pos += new_data_size
-
-                if self.tps.cached and self.tps_page.ref not in tps.cache_pages:
-                    tps.cache_pages[self.tps_page.ref] = self.__records
-
-    def __uncompress(self, data):
-        pos = 0
-        result = b''
-        while pos < len(data):
-            repeat_rel_offset = data[pos]
-            pos += 1
-
-            if repeat_rel_offset > 0x7F:
-                # size repeat_count = 2 bytes
-                repeat_rel_offset = ((data[pos] << 8) + ((repeat_rel_offset & 0x7F) << 1)) >> 1
-                pos += 1
-
-            result += data[pos:pos + repeat_rel_offset]
-            pos += repeat_rel_offset
-
-            if pos < len(data):
-                repeat_byte = bytes(result[-1:])
-                repeat_count = data[pos]
-                pos += 1
-
-                if repeat_count > 0x7F:
-                    repeat_count = ((data[pos] << 8) + ((repeat_count & 0x7F) << 1)) >> 1
-                    pos += 1
-
-                result += repeat_byte * repeat_count
-        return result
+                self.__records = list(records)
 
     def __getitem__(self, key):
         return self.__records[key]
@@ -189,9 +189,15 @@ class TpsTablesList:
         else:
             return True
 
+    def list(self):
+        return list(self.__tables)
+
     def get_definition(self, number):
         return self.__tables[number].get_definition()
 
+    def get_name(self, number):
+        return self.__tables[number].name
+
     def get_number(self, name):
         for i in self.__tables:
             if self.__tables[i].name == name:
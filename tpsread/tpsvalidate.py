@@ -0,0 +1,268 @@
+"""
+Integrity validation of TPS files
+
+Checks header, block map, page tree (offsets, overlaps, block containment) and
+data pages (decompressed sizes, record counts and sizes). Data pages are checked
+across worker processes. Problems are collected into a TpsValidationReport
+instead of being emitted as warnings or raised.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from construct import adapters
+
+from .tps import HEADER_STRUCT, TPS
+from .tpscrypt import TpsDecryptor
+from .tpspage import PAGE_HEADER_STRUCT, TpsPage, TpsPagesList
+from .tpsrecord import iter_records, read_page_data
+from .tpstable import TpsTablesList
+
+
+# Data pages checked by one worker task
+PAGES_PER_TASK = 256
+
+
+class TpsValidationReport:
+    """
+    Result of TPS file validation: file-level errors and errors per page ref
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.errors = []
+        self.page_errors = {}
+        self.page_count = 0
+        self.record_count = 0
+
+    def add(self, message, page_ref=None):
+        if page_ref is None:
+            self.errors.append(message)
+        else:
+            self.page_errors.setdefault(page_ref, []).append(message)
+
+    @property
+    def ok(self):
+        return not self.errors and not self.page_errors
+
+    def as_dict(self):
+        return {'filename': self.filename,
+                'ok': self.ok,
+                'page_count': self.page_count,
+                'record_count': self.record_count,
+                'errors': list(self.errors),
+                'page_errors': {ref: list(messages) for ref, messages in sorted(self.page_errors.items())}}
+
+
+def validate(tps, processes=None):
+    """
+    Validate an opened TPS file.
+
+    Data pages are checked by processes worker processes (default os.cpu_count()), which reopen
+    the file by its path; sources without a local path and processes=1 are checked in this process.
+    """
+    report = TpsValidationReport(tps.filename)
+    _check_header(tps, report)
+    return _validate(tps, report, processes)
+
+
+def validate_file(source, encoding=None, password=None, decryptor_class=TpsDecryptor, processes=None):
+    """
+    Validate TPS file source (path, buffer or file-like object, see TPS), including files TPS can not open:
+    header, page tree and tables are read here, and their errors are reported instead of raised.
+    """
+    report = TpsValidationReport(source if isinstance(source, str) else '')
+    try:
+        tps = TPS(source, encoding=encoding, password=password, cached=False, decryptor_class=decryptor_class,
+                  parse=False)
+    except (OSError, TypeError, ValueError) as e:
+        report.add('File can not be opened: {0}'.format(e))
+        return report
+    report.filename = tps.filename
+
+    if not _read_header(tps, report):
+        return report
+    _check_header(tps, report)
+
+    page_errors = {}
+    tps.pages = TpsPagesList(tps, tps.header.page_root_ref, errors=page_errors)
+    for page_ref, message in page_errors.items():
+        report.add(message, page_ref)
+
+    try:
+        tps.tables = TpsTablesList(tps, encoding=encoding)
+    except Exception as e:
+        report.add('Tables can not be read: {0!r}'.format(e))
+        tps.tables = None
+    return _validate(tps, report, processes)
+
+
+def _validate(tps, report, processes):
+    report.page_count = len(tps.pages.list())
+    _check_pages(tps, report)
+    record_sizes = _record_sizes(tps, report)
+
+    leaf_refs = [page.ref for page in tps.pages.leaves()]
+    tasks = [leaf_refs[i:i + PAGES_PER_TASK] for i in range(0, len(leaf_refs), PAGES_PER_TASK)]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes > 1 and len(tasks) > 1 and tps.path is not None:
+        with ProcessPoolExecutor(max_workers=min(processes, len(tasks)), initializer=_init_worker,
+                                 initargs=(tps.path, tps.encoding, tps.password,
+                                           type(tps.decryptor))) as executor:
+            results = executor.map(_check_data_pages_worker, tasks, itertools.repeat(record_sizes))
+            for page_errors, record_count in results:
+                _merge(report, page_errors, record_count)
+    else:
+        # bypass the page cache, so that every page is decompressed and checked
+        cached, cache_pages = tps.cached, tps.cache_pages
+        tps.cached, tps.cache_pages = False, {}
+        try:
+            for task in tasks:
+                _merge(report, *_check_data_pages(tps, task, record_sizes))
+        finally:
+            tps.cached, tps.cache_pages = cached, cache_pages
+    return report
+
+
+def _read_header(tps, report):
+    try:
+        tps.header = HEADER_STRUCT.parse(tps.read(0x200, 0))
+    except adapters.ConstError:
+        report.add('Bad header mark: not a TPS file or bad password')
+        return False
+    except Exception as e:
+        report.add('Header can not be parsed: {0!r}'.format(e))
+        return False
+    return True
+
+
+def _record_sizes(tps, report):
+    # record size by table number, None if tables are unknown
+    if tps.tables is None:
+        return None
+    record_sizes = {}
+    for table_number in tps.tables.list():
+        try:
+            record_sizes[table_number] = tps.tables.get_definition(table_number).record_size
+        except Exception as e:
+            report.add('Definition of table {0} can not be parsed: {1!r}'.format(table_number, e))
+    return record_sizes
+
+
+def _merge(report, page_errors, record_count):
+    for page_ref, messages in page_errors.items():
+        for message in messages:
+            report.add(message, page_ref)
+    report.record_count += record_count
+
+
+def _check_header(tps, report):
+    header = tps.header
+    if tps.file_size & 0x3F != 0:
+        report.add('File size {0} is not a multiple of 64 bytes'.format(tps.file_size))
+    if header.offset != 0:
+        report.add('Header offset {0} is not 0'.format(header.offset))
+    if header.size != 0x200:
+        report.add('Header size {0} is not 512'.format(header.size))
+    if header.file_size != tps.file_size:
+        report.add('Header file size {0} does not coincide with file size {1}'
+                   .format(header.file_size, tps.file_size))
+    if header.allocated_file_size < header.file_size:
+        report.add('Header allocated file size {0} is less than file size {1}'
+                   .format(header.allocated_file_size, header.file_size))
+
+    # block map: ordered, not overlapping, inside the file
+    max_ref = (tps.file_size - header.size) // 0x100
+    previous_end_ref = 0
+    for i, (start_ref, end_ref) in enumerate(zip(header.block_start_ref, header.block_end_ref)):
+        if start_ref > end_ref:
+            report.add('Block #{0} start ref {1} is greater than end ref {2}'.format(i, start_ref, end_ref))
+        if start_ref < previous_end_ref:
+            report.add('Block #{0} start ref {1} overlaps previous block end ref {2}'
+                       .format(i, start_ref, previous_end_ref))
+        if end_ref > max_ref:
+            report.add('Block #{0} end ref {1} is beyond the end of file'.format(i, end_ref))
+        previous_end_ref = max(previous_end_ref, end_ref)
+
+
+def _check_pages(tps, report):
+    pages = [tps.pages[ref] for ref in tps.pages.list()]
+    for page in pages:
+        offset = page.ref * 0x100 + tps.header.size
+        if page.offset != offset:
+            report.add('Page offset {0} does not coincide with page ref offset {1}'.format(page.offset, offset),
+                       page.ref)
+        if page.offset + page.size > tps.file_size:
+            report.add('Page end {0} is beyond the end of file'.format(page.offset + page.size), page.ref)
+        end_ref = (page.offset + page.size - tps.header.size) / 0x100
+        if not tps.block_contains(page.ref, end_ref):
+            report.add('No block contains the page', page.ref)
+
+    # overlaps in file order: with the page reaching furthest among the previous ones
+    pages.sort(key=lambda page: page.offset)
+    end_page = None
+    for page in pages:
+        if end_page is not None and page.offset < end_page.offset + end_page.size:
+            report.add('Page intersects with the page ref# {0}'.format(end_page.ref), page.ref)
+        if end_page is None or page.offset + page.size > end_page.offset + end_page.size:
+            end_page = page
+
+
+def _check_data_pages(tps, page_refs, record_sizes):
+    """
+    Check decompressed sizes, record counts and data record sizes (record_sizes by table number,
+    None to skip) of data pages.
+
+    Return (errors per page ref, record count).
+    """
+    page_errors = {}
+    record_count = 0
+    for page_ref in page_refs:
+        messages = []
+        try:
+            # page offsets are checked by _check_pages
+            page = TpsPage(tps, page_ref, None)
+            data = read_page_data(tps, page)
+            if page.uncompressed_size > page.size and len(data) + PAGE_HEADER_STRUCT.sizeof() != \
+                    page.uncompressed_size:
+                messages.append('Uncompressed size {0} does not coincide with page uncompressed size {1}'
+                                .format(len(data) + PAGE_HEADER_STRUCT.sizeof(), page.uncompressed_size))
+            records = list(iter_records(data))
+        except Exception as e:
+            messages.append('Records can not be read: {0!r}'.format(e))
+            page = None
+            records = []
+
+        if records and len(records) != page.record_count:
+            messages.append('Record count {0} does not coincide with page record count {1}'
+                            .format(len(records), page.record_count))
+        for i, record in enumerate(records):
+            if record.type != 'DATA' or record_sizes is None:
+                continue
+            table_number = record.data.table_number
+            if table_number not in record_sizes:
+                messages.append('Record #{0} belongs to unknown table {1}'.format(i, table_number))
+            elif len(record.data.data) != record_sizes[table_number]:
+                messages.append('Record #{0} size {1} does not coincide with table record size {2}'
+                                .format(i, len(record.data.data), record_sizes[table_number]))
+        record_count += len(records)
+        if messages:
+            page_errors[page_ref] = messages
+    return page_errors, record_count
+
+
+# TPS file opened by a worker process
+_worker_tps = None
+
+
+def _init_worker(filename, encoding, password, decryptor_class):
+    global _worker_tps
+    _worker_tps = TPS(filename, encoding=encoding, password=password, cached=False,
+                      decryptor_class=decryptor_class, parse=False)
+    _worker_tps.header = HEADER_STRUCT.parse(_worker_tps.read(0x200, 0))
+
+
+def _check_data_pages_worker(page_refs, record_sizes):
+    return _check_data_pages(_worker_tps, page_refs, record_sizes)
@@ -1,3 +1,5 @@
+import queue
+import threading
 from warnings import warn
 
 
@@ -8,5 +10,51 @@ def check_value(name, value, check):
              .format(param_name=name, param_value=value, param_check=check), RuntimeWarning, 2)
 
 
+def prefetch(iterable, depth):
+    """
+    Iterate iterable in a background thread, up to depth items ahead of the consumer.
+
+    With depth <= 0 iterable is iterated in the calling thread.
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except BaseException as e:
+            put((False, e))
+        else:
+            put((False, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            has_item, item = items.get()
+            if not has_item:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+
+
 if __name__ == '__main__':
     check_value('test_param', 0, 1)